@@ -1,35 +1,74 @@
+import json
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 import tempfile
 import threading
 import time
-from flask import Flask, render_template, request, redirect, url_for, send_file, flash, jsonify
+import uuid
+from flask import Flask, render_template, request, redirect, url_for, send_file, flash, Response
 from werkzeug.utils import secure_filename
 
 from pdf_document_management import PDFDocumentManager
 from translation_model import TranslationModel
 from quality_estimator import QualityEstimator
 
+# try optional import - orjson (Rust, SIMD) encodes large payloads several
+# times faster than the stdlib json encoder
+try:
+    import orjson
+except Exception:
+    orjson = None
+
 ALLOWED_EXTENSIONS = {'pdf'}
 
+# Static data: only show full language names (filter out 2-letter codes),
+# computed once at import instead of per request
+_LANG_KEYS = sorted(lang for lang in TranslationModel.LANGUAGE_CODES if len(lang) > 2)
+
 app = Flask(__name__)
 app.secret_key = "dev"
 UPLOAD_DIR = Path(tempfile.gettempdir()) / "poc_at_uploads"
 UPLOAD_DIR.mkdir(parents=True, exist_ok=True)
 
-translation_state = {
-    "active": False,
-    "progress": {"current_batch": 0, "total_batches": 0, "current_text": ""},
-    "result": None,
-    "original": None,
-    "download_url": None,
-    "error": None,
-    "quality_score": None,
-    "timing": {
-        "total_time": 0.0,
-        "translation_time": 0.0,
-        "quality_estimation_time": 0.0
+# Lazily-initialized QualityEstimator shared across all translation threads.
+# The COMET-QE checkpoint is several hundred MB; loading it once per process
+# instead of once per request removes the dominant cost for short PDFs.
+_QE_SINGLETON = None
+_QE_LOCK = threading.Lock()
+
+
+def get_quality_estimator() -> QualityEstimator:
+    """Return the process-wide QualityEstimator, loading it on first use."""
+    global _QE_SINGLETON
+    if _QE_SINGLETON is None:
+        with _QE_LOCK:
+            if _QE_SINGLETON is None:
+                _QE_SINGLETON = QualityEstimator()
+    return _QE_SINGLETON
+
+
+# One persistent worker instead of a fresh thread per upload: bounds
+# concurrent GPU usage to a single translation and keeps per-job state
+# separate so concurrent uploads no longer trample each other.
+_EXECUTOR = ThreadPoolExecutor(max_workers=1)
+_JOBS: dict[str, dict] = {}
+
+
+def _new_job_state() -> dict:
+    return {
+        "active": True,
+        "progress": {"current_batch": 0, "total_batches": 0, "current_text": ""},
+        "result_url": None,
+        "original_url": None,
+        "download_url": None,
+        "error": None,
+        "quality_score": None,
+        "timing": {
+            "total_time": 0.0,
+            "translation_time": 0.0,
+            "quality_estimation_time": 0.0
+        }
     }
-}
 
 
 def allowed_file(filename: str) -> bool:
@@ -38,35 +77,78 @@ def allowed_file(filename: str) -> bool:
 
 @app.route("/", methods=["GET"])
 def index():
-    # Only show full language names (filter out 2-letter codes)
-    lang_keys = sorted([lang for lang in TranslationModel.LANGUAGE_CODES.keys() if len(lang) > 2])
-    return render_template("index.html", languages=lang_keys)
-
-
-@app.route("/progress", methods=["GET"])
-def progress():
-    """Return current translation progress as JSON."""
-    return jsonify(translation_state)
-
-
-def _translate_background(uploaded_path: Path, src_lang: str, tgt_lang: str, out_name: str):
-    """Background thread function for translation."""
-    global translation_state
+    return render_template("index.html", languages=_LANG_KEYS)
+
+
+def _json_response(payload, status: int = 200) -> Response:
+    if orjson is not None:
+        return Response(orjson.dumps(payload), status=status, mimetype="application/json")
+    return Response(json.dumps(payload), status=status, mimetype="application/json")
+
+
+@app.route("/progress/<job_id>", methods=["GET"])
+def progress(job_id: str):
+    """Return current translation progress for a job as JSON."""
+    state = _JOBS.get(job_id)
+    if state is None:
+        return _json_response({"error": "Unknown job"}, status=404)
+    # The state only holds URLs for the document texts (they live on disk),
+    # so every poll serializes a few hundred bytes rather than megabytes
+    return _json_response(state)
+
+
+@app.route("/progress/stream/<job_id>", methods=["GET"])
+def progress_stream(job_id: str):
+    """Push progress deltas over a persistent SSE connection.
+
+    One socket replaces the client's poll loop, and only the small
+    progress/error snapshot is serialized — not the full result text.
+    The client fetches the progress endpoint once at the end for the
+    final payload.
+    """
+    state = _JOBS.get(job_id)
+    if state is None:
+        return _json_response({"error": "Unknown job"}, status=404)
+
+    def event_stream():
+        last = None
+        while True:
+            snapshot = {
+                "active": state["active"],
+                "progress": dict(state["progress"]),
+                "error": state["error"],
+            }
+            payload = json.dumps(snapshot)
+            if payload != last:
+                last = payload
+                yield f"data: {payload}\n\n"
+            if not snapshot["active"]:
+                break
+            time.sleep(0.2)
+
+    return Response(event_stream(), mimetype="text/event-stream")
+
+
+def _translate_background(job_id: str, pdf_bytes: bytes, src_lang: str, tgt_lang: str, out_name: str):
+    """Worker-pool task translating one uploaded document."""
+    state = _JOBS[job_id]
     try:
         start_time = time.time()
-        translation_state["error"] = None
-        
-        # Extract & clean
-        raw_text = PDFDocumentManager.extract_text_from_pdf(str(uploaded_path))
+        state["error"] = None
+
+        # Extract & clean straight from the uploaded bytes - no disk round-trip
+        raw_text = PDFDocumentManager.extract_text_from_pdf(pdf_bytes)
         cleaned = PDFDocumentManager.clean_text_for_translation(raw_text)
 
-        # Store original for comparison
-        translation_state["original"] = cleaned
+        # Persist the cleaned source for the comparison view; only its URL
+        # goes into the polled job state
+        PDFDocumentManager.save_text_to_file(cleaned, str(UPLOAD_DIR / f"{job_id}.src.txt"))
+        state["original_url"] = f"/original/{job_id}"
+
+        # Create translator and pass reference to the job's progress state
+        translator = TranslationModel(progress_callback=lambda: state["progress"])
 
-        # Create translator and pass reference to shared progress state
-        translator = TranslationModel(progress_callback=lambda: translation_state["progress"])
-        
-        # Translate - translator will update translation_state["progress"] directly
+        # Translate - translator will update state["progress"] directly
         translation_start = time.time()
         translated = translator.translate(cleaned, src_lang, tgt_lang)
         translation_end = time.time()
@@ -82,45 +164,40 @@ def _translate_background(uploaded_path: Path, src_lang: str, tgt_lang: str, out
         quality_estimation_time = 0.0
         try:
             quality_start = time.time()
-            estimator = QualityEstimator()
+            estimator = get_quality_estimator()
             quality_result = estimator.evaluate_with_interpretation(cleaned, translated)
             quality_end = time.time()
             quality_estimation_time = quality_end - quality_start
-            translation_state["quality_score"] = quality_result
+            state["quality_score"] = quality_result
             print(f"✓ Quality estimation completed in {quality_estimation_time:.2f} seconds")
             print(f"Quality Score: {quality_result['score']:.1f}/100 ({quality_result['level']})")
         except Exception as qe_error:
             print(f"Warning: Quality estimation failed: {qe_error}")
-            translation_state["quality_score"] = None
+            state["quality_score"] = None
 
         total_time = time.time() - start_time
-        
+
         # Store timing information
-        translation_state["timing"] = {
+        state["timing"] = {
             "total_time": total_time,
             "translation_time": translation_time,
             "quality_estimation_time": quality_estimation_time
         }
         print(f"✓ Total processing time: {total_time:.2f} seconds")
 
-        translation_state["result"] = translated
-        translation_state["download_url"] = f"/download/{out_name}"
+        PDFDocumentManager.save_text_to_file(translated, str(UPLOAD_DIR / f"{job_id}.mt.txt"))
+        state["result_url"] = f"/result/{job_id}"
+        state["download_url"] = f"/download/{out_name}"
 
     except Exception as e:
-        translation_state["error"] = str(e)
+        state["error"] = str(e)
         print(f"Translation error: {e}")
     finally:
-        translation_state["active"] = False
-        try:
-            uploaded_path.unlink(missing_ok=True)
-        except Exception:
-            pass
+        state["active"] = False
 
 
 @app.route("/translate", methods=["POST"])
 def translate():
-    global translation_state
-
     if "pdf_file" not in request.files:
         flash("No file part")
         return redirect(url_for("index"))
@@ -137,34 +214,36 @@ def translate():
     src_lang = request.form.get("source_lang", "portuguese")
     tgt_lang = request.form.get("target_lang", "english")
     filename = secure_filename(file.filename)
-    uploaded_path = UPLOAD_DIR / filename
-    file.save(uploaded_path)
+    # Keep the upload in memory: saving to UPLOAD_DIR only to re-read it in
+    # the worker added a full write plus read to the hot path
+    pdf_bytes = file.read()
 
-    # reset state
-    translation_state.update({
-        "active": True,
-        "progress": {"current_batch": 0, "total_batches": 0, "current_text": ""},
-        "result": None,
-        "original": None,
-        "download_url": None,
-        "error": None,
-        "quality_score": None,
-        "timing": {
-            "total_time": 0.0,
-            "translation_time": 0.0,
-            "quality_estimation_time": 0.0
-        }
-    })
+    job_id = uuid.uuid4().hex
+    _JOBS[job_id] = _new_job_state()
+
+    out_name = Path(filename).stem + f"_{tgt_lang}.txt"
+    _EXECUTOR.submit(_translate_background, job_id, pdf_bytes, src_lang, tgt_lang, out_name)
+
+    return render_template("progress.html", job_id=job_id)
+
+
+def _send_job_text(job_id: str, suffix: str):
+    fpath = UPLOAD_DIR / f"{job_id}.{suffix}.txt"
+    if not fpath.exists():
+        return _json_response({"error": "Unknown job"}, status=404)
+    return send_file(str(fpath), mimetype="text/plain", conditional=True)
+
+
+@app.route("/result/<job_id>", methods=["GET"])
+def result_text(job_id: str):
+    """Serve the translated text of a finished job."""
+    return _send_job_text(job_id, "mt")
 
-    out_name = uploaded_path.stem + f"_{tgt_lang}.txt"
-    thread = threading.Thread(
-        target=_translate_background,
-        args=(uploaded_path, src_lang, tgt_lang, out_name),
-        daemon=True
-    )
-    thread.start()
 
-    return render_template("progress.html")
+@app.route("/original/<job_id>", methods=["GET"])
+def original_text(job_id: str):
+    """Serve the cleaned source text of a finished job."""
+    return _send_job_text(job_id, "src")
 
 
 @app.route("/download/<path:filename>", methods=["GET"])
@@ -177,4 +256,4 @@ def download_file(filename):
 
 
 if __name__ == "__main__":
-    app.run(host="127.0.0.1", port=5000, debug=True)
\ No newline at end of file
+    app.run(host="127.0.0.1", port=5000, debug=True)
@@ -1,6 +1,10 @@
+import io
+import mmap
+import os
 import subprocess
 import shutil
 import re
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, TimeoutError as FutureTimeoutError, wait
 import PyPDF2
 import unicodedata
 
@@ -13,17 +17,50 @@ except Exception:
     LAParams = None
 
 
+# Compiled once at import: these run on every document, and re.sub with a
+# literal pattern pays a regex-cache probe per call
+_RE_SPACES = re.compile(r'[ \t]{2,}')
+_RE_NEWLINES = re.compile(r'\n{3,}')
+_RE_ALL_WS = re.compile(r'\s+')
+# Control chars and whitespace both collapse to a single space, so one
+# fused pattern replaces separate control-char and whitespace passes
+# with a single scan
+_RE_CTRL_OR_WS = re.compile(r'[\x00-\x1f\x7f-\x9f\s]+')
+
+# Byte-level classification table for Latin-1-encodable text: C0/C1 control
+# bytes and the non-breaking space all become a plain space. bytes.translate
+# runs one table lookup per byte in a single C loop \u2014 the fastest scan
+# available without native extensions. The soft hyphen (0xAD) must be
+# deleted rather than spaced, which bytes.translate handles separately.
+_BYTES_CTRL_TO_SPACE = bytes(
+    0x20 if b <= 0x1f or 0x7f <= b <= 0x9f or b == 0xa0 else b
+    for b in range(256)
+)
+_BYTES_DELETE = b'\xad'
+
+# Single translate table: soft hyphen / BOM / zero-width space dropped,
+# non-breaking space mapped to a regular space \u2014 one C-level pass instead
+# of a chain of str.replace calls that each rescan the document
+_CLEAN_TABLE = str.maketrans({
+    '\u00ad': '',   # Soft hyphen (PDF line-break artifact)
+    '\ufeff': '',   # BOM
+    '\u200b': '',   # Zero-width space
+    '\u00a0': ' ',  # Non-breaking space -> regular space
+})
+
+
 class PDFDocumentManager:
     """Manages PDF document operations including text extraction."""
 
     @staticmethod
     def _normalize_whitespace(text: str) -> str:
         """Remove special characters and normalize whitespace."""
-        text = text.replace('\ufeff', '')
-        text = text.replace('\u200b', '')
-        text = text.replace('\u00a0', ' ')
-        text = re.sub(r'[ \t]{2,}', ' ', text)
-        text = re.sub(r'\n{3,}', '\n\n', text)
+        text = text.translate(_CLEAN_TABLE)
+        text = _RE_SPACES.sub(' ', text)
+        # Cheap containment check before the regex pass: extractors that
+        # already join pages with exactly "\n\n" skip it entirely
+        if '\n\n\n' in text:
+            text = _RE_NEWLINES.sub('\n\n', text)
         return text
 
     @staticmethod
@@ -42,88 +79,205 @@ class PDFDocumentManager:
         if not text:
             return text
 
-        # Unicode normalization (canonical form)
-        text = unicodedata.normalize('NFC', text)
+        # Fastest path: str.isascii is an O(1) flag check on compact
+        # strings, and ASCII input can go straight to the byte-table scan
+        # without the latin-1 encode attempt below
+        if text.isascii():
+            cleaned = text.encode('ascii').translate(_BYTES_CTRL_TO_SPACE, _BYTES_DELETE)
+            return _RE_ALL_WS.sub(' ', cleaned.decode('ascii')).strip()
 
-        # Remove soft-hyphen (PDF artifacts from line breaks)
-        text = text.replace('\u00ad', '')
+        # Fast path: Latin-1-encodable text (covers Portuguese/Western
+        # European PDFs) is cleaned with a single byte-table scan. Latin-1
+        # has no combining marks, zero-width chars or BOM, so NFC
+        # normalization and the Unicode translate table would be no-ops.
+        try:
+            raw = text.encode('latin-1')
+        except UnicodeEncodeError:
+            pass
+        else:
+            cleaned = raw.translate(_BYTES_CTRL_TO_SPACE, _BYTES_DELETE)
+            text = cleaned.decode('latin-1')
+            return _RE_ALL_WS.sub(' ', text).strip()
 
-        # Remove invisible/zero-width characters
-        text = text.replace('\ufeff', '')  # BOM
-        text = text.replace('\u200b', '')  # Zero-width space
-        text = text.replace('\u00a0', ' ')  # Non-breaking space -> regular space
+        # Unicode normalization (canonical form)
+        text = unicodedata.normalize('NFC', text)
 
-        # Remove control characters (except space)
-        text = re.sub(r'[\x00-\x1f\x7f-\x9f]', ' ', text)
+        # Remove soft-hyphen and invisible/zero-width characters in one pass
+        text = text.translate(_CLEAN_TABLE)
 
-        # Normalize all whitespace to single spaces
-        text = re.sub(r'\s+', ' ', text)
+        # Replace control characters and collapse whitespace runs to single
+        # spaces in one scan (control chars became spaces anyway, and the
+        # whitespace pass then merged them)
+        text = _RE_CTRL_OR_WS.sub(' ', text)
 
         # Trim
         return text.strip()
 
     @staticmethod
-    def _extract_with_pdftotext(pdf_path: str) -> str | None:
+    def _extract_with_pdftotext(source: bytes | str) -> str | None:
         pdftotext_path = shutil.which("pdftotext")
         if not pdftotext_path:
             return None
         try:
-            proc = subprocess.run([pdftotext_path, "-enc", "UTF-8", pdf_path, "-"],
-                                  stdout=subprocess.PIPE, stderr=subprocess.PIPE, check=True)
-            return proc.stdout.decode("utf-8", errors="replace")
+            if isinstance(source, bytes):
+                # Feed the PDF through stdin ("-" input) so the upload never
+                # has to touch disk
+                with subprocess.Popen([pdftotext_path, "-enc", "UTF-8", "-", "-"],
+                                      stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                                      stderr=subprocess.DEVNULL) as proc:
+                    out, _ = proc.communicate(source)
+                if proc.returncode != 0:
+                    return None
+                return out.decode("utf-8", errors="replace")
+            # Read stdout incrementally instead of letting subprocess.run
+            # buffer the whole output as bytes and decode it in a second pass
+            with subprocess.Popen([pdftotext_path, "-enc", "UTF-8", source, "-"],
+                                  stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+                                  text=True, encoding="utf-8", errors="replace",
+                                  bufsize=1024 * 1024) as proc:
+                text = proc.stdout.read()
+            if proc.returncode != 0:
+                return None
+            return text
         except Exception:
             return None
 
     @staticmethod
-    def _extract_with_pdfminer(pdf_path: str) -> str | None:
+    def _extract_with_pdfminer(source: bytes | str) -> str | None:
         if pdfminer_extract_text is None:
             return None
         try:
             laparams = LAParams(char_margin=2.0, word_margin=0.1, line_margin=0.5)
-            return pdfminer_extract_text(pdf_path, laparams=laparams)
+            if isinstance(source, bytes):
+                return pdfminer_extract_text(io.BytesIO(source), laparams=laparams)
+            # Hand pdfminer an mmap-backed file object: random access during
+            # parsing reads straight from the page cache instead of syscalls
+            with open(source, 'rb') as f:
+                try:
+                    with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                        return pdfminer_extract_text(mm, laparams=laparams)
+                except (ValueError, OSError):
+                    return pdfminer_extract_text(f, laparams=laparams)
         except Exception:
             return None
 
     @staticmethod
-    def _extract_with_pypdf2(pdf_path: str) -> str:
-        parts = []
-        with open(pdf_path, 'rb') as f:
-            reader = PyPDF2.PdfReader(f)
-            for page in reader.pages:
+    def _extract_page_text(source: bytes | str, index: int) -> str:
+        """Parse one page with a private reader over a private stream.
+
+        PyPDF2 readers are not thread-safe: object resolution does
+        interleaved seek/read on the underlying stream, so workers sharing
+        a reader corrupt each other's parses. Per-worker readers cost one
+        extra xref parse per page but stay on the page cache.
+        """
+        try:
+            if isinstance(source, bytes):
+                reader = PyPDF2.PdfReader(io.BytesIO(source))
+                # Trailing whitespace is stripped per page so the "\n\n"
+                # join needs no follow-up newline-collapsing pass
+                return (reader.pages[index].extract_text() or "").rstrip()
+            with open(source, 'rb') as f:
+                # mmap gives PyPDF2's seek-heavy xref parsing zero-copy
+                # access to the page cache; fall back to the plain file on
+                # failure (e.g. empty file)
                 try:
-                    pt = page.extract_text()
-                except Exception:
-                    pt = None
-                parts.append(pt or "")
-        return "\n\n".join(parts)
+                    stream = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+                except (ValueError, OSError):
+                    stream = f
+                try:
+                    reader = PyPDF2.PdfReader(stream)
+                    return (reader.pages[index].extract_text() or "").rstrip()
+                finally:
+                    if stream is not f:
+                        stream.close()
+        except Exception:
+            return ""
 
     @staticmethod
-    def extract_text_from_pdf(pdf_path: str) -> str:
+    def _extract_pages(source: bytes | str, num_pages: int) -> list[str]:
+        if num_pages <= 1:
+            return [PDFDocumentManager._extract_page_text(source, i) for i in range(num_pages)]
+        # Per-page content-stream parsing is independent work; spread
+        # it over cores for multi-page documents, one reader per worker
+        with ThreadPoolExecutor(max_workers=min(num_pages, os.cpu_count() or 1)) as ex:
+            return list(ex.map(PDFDocumentManager._extract_page_text,
+                               [source] * num_pages, range(num_pages)))
+
+    @staticmethod
+    def _extract_with_pypdf2(source: bytes | str) -> str:
+        if isinstance(source, bytes):
+            num_pages = len(PyPDF2.PdfReader(io.BytesIO(source)).pages)
+        else:
+            with open(source, 'rb') as f:
+                num_pages = len(PyPDF2.PdfReader(f).pages)
+        parts = PDFDocumentManager._extract_pages(source, num_pages)
+        return "\n\n".join(p for p in parts if p)
+
+    @staticmethod
+    def extract_text_from_pdf(source: bytes | str) -> str:
         """
-        Extract text from PDF with multiple strategies:
+        Extract text from a PDF path or in-memory PDF bytes with multiple
+        strategies:
         1) try pdftotext (system tool, most robust)
         2) try pdfminer.six if installed
         3) fallback to PyPDF2
+
+        Passing bytes keeps uploads off disk entirely.
+
+        The strategies run concurrently and the first non-empty result wins,
+        so a missing pdftotext binary or a slow pdfminer parse no longer adds
+        its full runtime to the latency of the fallback. Raises if every
+        strategy fails or comes back empty.
         """
-        # 1) try pdftotext (preferred)
-        txt = PDFDocumentManager._extract_with_pdftotext(pdf_path)
-        if txt:
-            return PDFDocumentManager._normalize_whitespace(txt)
+        with ThreadPoolExecutor(max_workers=3) as ex:
+            # Give pdftotext (fastest and most robust) a short head start so
+            # it still wins whenever it is installed and succeeds quickly
+            preferred = ex.submit(PDFDocumentManager._extract_with_pdftotext, source)
+            try:
+                txt = preferred.result(timeout=0.05)
+                if txt:
+                    return PDFDocumentManager._normalize_whitespace(txt)
+                preferred = None
+            except FutureTimeoutError:
+                pass
 
-        # 2) try pdfminer.six
-        txt = PDFDocumentManager._extract_with_pdfminer(pdf_path)
-        if txt:
-            return PDFDocumentManager._normalize_whitespace(txt)
+            futures = [f for f in (
+                preferred,
+                ex.submit(PDFDocumentManager._extract_with_pdfminer, source),
+                ex.submit(PDFDocumentManager._extract_with_pypdf2, source),
+            ) if f is not None]
 
-        # 3) fallback to PyPDF2
-        txt = PDFDocumentManager._extract_with_pypdf2(pdf_path)
-        return PDFDocumentManager._normalize_whitespace(txt)
+            last_error = None
+            pending = set(futures)
+            while pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                # Preserve preference order among extractors that finished
+                # in the same batch
+                for fut in (f for f in futures if f in done):
+                    try:
+                        txt = fut.result()
+                    except Exception as extract_error:
+                        last_error = extract_error
+                        txt = None
+                    if txt:
+                        for p in pending:
+                            p.cancel()
+                        return PDFDocumentManager._normalize_whitespace(txt)
+        # Surface the failure instead of returning "": an unreadable PDF
+        # must reach the caller as an error, not as an empty translation
+        if last_error is not None:
+            raise Exception(f"Could not extract text from PDF: {str(last_error)}")
+        raise Exception("Could not extract text from PDF: all extractors returned empty output")
 
     @staticmethod
     def save_text_to_file(text: str, output_path: str) -> None:
         """Save extracted text to a .txt file."""
         try:
-            with open(output_path, 'w', encoding='utf-8') as f:
-                f.write(text)
+            # Encode once and write the whole buffer unbuffered: one large
+            # write() instead of many 8 KiB text-mode chunks with newline
+            # translation
+            data = text.encode('utf-8')
+            with open(output_path, 'wb', buffering=0) as f:
+                f.write(data)
         except Exception as e:
             raise Exception(f"Error saving text file: {str(e)}")
\ No newline at end of file
@@ -6,25 +6,51 @@ Provides a single quality score (0-100) comparing source text to translation.
 Works across multiple language pairs without needing human reference translations.
 """
 
-from typing import Dict, Optional
+import re
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
 import torch
 
+# Sentence boundary: terminal punctuation followed by whitespace
+_SENTENCE_SPLIT = re.compile(r'(?<=[.!?])\s+')
+
 
 class QualityEstimator:
     """Reference-free translation quality estimator using COMET-QE."""
     
-    def __init__(self, model_name: str = "Unbabel/wmt22-cometkiwi-da"):
+    def __init__(self, model_name: str = "Unbabel/wmt22-cometkiwi-da", precision: str = "auto",
+                 quantize: bool = False):
         """
         Initialize quality estimator with COMET-QE model.
-        
+
         Args:
             model_name: COMET model identifier
                 - "Unbabel/wmt22-cometkiwi-da" (recommended, latest QE model - requires HF login)
                 - "Unbabel/wmt20-comet-qe-da" (older alternative, publicly available)
+            precision: Inference precision - "auto" (half precision on GPU,
+                bf16 on Ampere+, fp32 on CPU), "fp32", "fp16" or "bf16"
+            quantize: Quantize linear layers to int8 (dynamic quantization
+                on CPU, bitsandbytes on GPU when installed) - roughly 2-4x
+                faster and 4x smaller than FP32 at a ~1-2 point score cost
         """
         self.model_name = model_name
+        self.precision = precision
+        self.quantize = quantize
         self.model = None
+        self._autocast_dtype = None
         self._load_model()
+
+    def _resolve_dtype(self) -> Optional[torch.dtype]:
+        """Pick the reduced-precision dtype for GPU inference (None = FP32)."""
+        if self.precision == "fp32" or not torch.cuda.is_available():
+            return None
+        if self.precision == "fp16":
+            return torch.float16
+        if self.precision == "bf16":
+            return torch.bfloat16
+        # "auto": prefer bf16 on Ampere+ (compute capability >= 8.0), else fp16
+        major, _ = torch.cuda.get_device_capability()
+        return torch.bfloat16 if major >= 8 else torch.float16
     
     def _load_model(self):
         """Load COMET-QE model (downloads on first run)."""
@@ -34,17 +60,69 @@ class QualityEstimator:
             print(f"Loading COMET-QE model '{self.model_name}'...")
             model_path = download_model(self.model_name)
             self.model = load_from_checkpoint(model_path)
-            
+            self.model.eval()
+
             # Store tokenizer and max length for truncation detection
             self.tokenizer = self.model.encoder.tokenizer
             self.max_length = self.model.encoder.model.config.max_position_embeddings
-            
+
+            # Cache token-length probes per sentence: PDFs repeat headers,
+            # footers and boilerplate, and SentencePiece runs are not free
+            tokenizer = self.tokenizer
+
+            @lru_cache(maxsize=8192)
+            def _token_length(sentence: str) -> int:
+                return len(tokenizer(sentence, truncation=False, add_special_tokens=True)['input_ids'])
+
+            self._token_length = _token_length
+
             # Move to GPU if available
             if torch.cuda.is_available():
                 print("✓ Using GPU for quality estimation")
             else:
                 print("✓ Using CPU for quality estimation (slower)")
-            
+
+            # Cast to half precision on GPU: halves memory bandwidth and
+            # unlocks tensor-core throughput for the XLM-R encoder
+            self._autocast_dtype = self._resolve_dtype()
+            if self._autocast_dtype is not None:
+                self.model = self.model.to(self._autocast_dtype)
+                print(f"✓ Using {self._autocast_dtype} precision for quality estimation")
+
+            if self.quantize:
+                self._quantize_model()
+
+            # Warm-up prediction so the first real request doesn't pay
+            # kernel compilation / autotune cost
+            def _warm_up():
+                with torch.inference_mode():
+                    self.model.predict(
+                        [{"src": "a", "mt": "b"}],
+                        batch_size=1,
+                        gpus=1 if torch.cuda.is_available() else 0
+                    )
+
+            # Optionally compile the XLM-R encoder to cut per-op Python
+            # dispatch overhead; fall back to eager if compilation fails
+            # (older torch, unsupported ops, etc.). Dynamo defers the real
+            # compilation to the first forward, so the warm-up runs inside
+            # the same try and the compiled encoder is only kept once it
+            # has executed successfully.
+            eager_encoder = self.model.encoder
+            try:
+                self.model.encoder = torch.compile(
+                    eager_encoder, mode="reduce-overhead", fullgraph=False
+                )
+                _warm_up()
+                print("✓ COMET-QE encoder compiled with torch.compile")
+            except Exception as compile_error:
+                self.model.encoder = eager_encoder
+                print(f"Note: torch.compile unavailable, using eager mode ({compile_error})")
+                try:
+                    _warm_up()
+                except Exception as warmup_error:
+                    print(f"Note: warm-up prediction failed ({warmup_error})")
+
             print(f"✓ COMET-QE model loaded successfully (max tokens: {self.max_length})")
             
         except ImportError:
@@ -54,59 +132,117 @@ class QualityEstimator:
         except Exception as e:
             raise RuntimeError(f"Failed to load COMET-QE model: {str(e)}")
     
+    @staticmethod
+    def _split_aligned(source: str, translation: str) -> List[Tuple[str, str]]:
+        """
+        Split source and translation into aligned sentence pairs.
+
+        Sentence counts rarely match exactly across languages, so the shorter
+        side is padded with empty strings. This keeps COMET inputs well inside
+        XLM-R's 512-token window and lets predict() batch on the GPU.
+        """
+        src_sents = [s for s in _SENTENCE_SPLIT.split(source) if s.strip()]
+        mt_sents = [s for s in _SENTENCE_SPLIT.split(translation) if s.strip()]
+
+        if not src_sents or not mt_sents:
+            return [(source, translation)]
+
+        n = max(len(src_sents), len(mt_sents))
+        src_sents += [""] * (n - len(src_sents))
+        mt_sents += [""] * (n - len(mt_sents))
+        return list(zip(src_sents, mt_sents))
+
+    def _quantize_model(self):
+        """Quantize the linear-heavy XLM-R encoder to int8.
+
+        On CPU, dynamic quantization routes matmuls through VNNI int8
+        kernels; on GPU, bitsandbytes Linear8bitLt layers are used when the
+        library is installed. Failures leave the model as loaded.
+        """
+        try:
+            if not torch.cuda.is_available():
+                self.model = torch.quantization.quantize_dynamic(
+                    self.model, {torch.nn.Linear}, dtype=torch.qint8
+                )
+                print("✓ COMET-QE quantized to int8 (dynamic, CPU)")
+                return
+            import bitsandbytes as bnb
+
+            def _swap_linears(module):
+                for name, child in module.named_children():
+                    if isinstance(child, torch.nn.Linear):
+                        replacement = bnb.nn.Linear8bitLt(
+                            child.in_features, child.out_features,
+                            bias=child.bias is not None, has_fp16_weights=False
+                        )
+                        replacement.load_state_dict(child.state_dict())
+                        setattr(module, name, replacement)
+                    else:
+                        _swap_linears(child)
+
+            _swap_linears(self.model.encoder)
+            print("✓ COMET-QE encoder quantized to int8 (bitsandbytes, GPU)")
+        except Exception as quant_error:
+            print(f"Note: int8 quantization unavailable, keeping loaded precision ({quant_error})")
+
     def estimate_quality(self, source: str, translation: str) -> float:
         """
         Estimate translation quality without reference.
-        
+
         Args:
             source: Source text (original language)
             translation: Translated text (target language)
-            
+
         Returns:
             Quality score (0-100, higher is better)
         """
         if not source or not translation:
             return 0.0
-        
+
         if self.model is None:
             raise RuntimeError("COMET-QE model not loaded")
-        
+
         # Remove ALL line breaks from both inputs to eliminate formatting differences
         # This ensures COMET only evaluates translation quality, not formatting alignment
         source_cleaned = source.replace('\n', ' ').strip()
         translation_cleaned = translation.replace('\n', ' ').strip()
-        
+
+        # Split into aligned sentence pairs: whole documents exceed XLM-R's
+        # 512-token window (truncated, low signal) and waste padding, while
+        # short sequences batch efficiently on the GPU
+        pairs = self._split_aligned(source_cleaned, translation_cleaned)
+
         # Detect potential truncation by tokenizing and checking lengths
-        src_tokens = self.tokenizer(source_cleaned, truncation=False, add_special_tokens=True)
-        mt_tokens = self.tokenizer(translation_cleaned, truncation=False, add_special_tokens=True)
-        
-        src_length = len(src_tokens['input_ids'])
-        mt_length = len(mt_tokens['input_ids'])
-        
-        if src_length > self.max_length:
-            print(f"⚠️  TRUNCATION DETECTED: Source text will be truncated for COMET-QE!")
-            print(f"    {src_length} tokens -> {self.max_length} tokens (LOST {src_length - self.max_length} tokens)")
-            print(f"    Quality score may be inaccurate due to missing context.")
-        
-        if mt_length > self.max_length:
-            print(f"⚠️  TRUNCATION DETECTED: Translation will be truncated for COMET-QE!")
-            print(f"    {mt_length} tokens -> {self.max_length} tokens (LOST {mt_length - self.max_length} tokens)")
-            print(f"    Quality score may be inaccurate due to missing context.")
-        
+        for src_sent, mt_sent in pairs:
+            src_length = self._token_length(src_sent)
+            mt_length = self._token_length(mt_sent)
+
+            if src_length > self.max_length:
+                print(f"⚠️  TRUNCATION DETECTED: Source sentence will be truncated for COMET-QE!")
+                print(f"    {src_length} tokens -> {self.max_length} tokens (LOST {src_length - self.max_length} tokens)")
+                print(f"    Quality score may be inaccurate due to missing context.")
+
+            if mt_length > self.max_length:
+                print(f"⚠️  TRUNCATION DETECTED: Translated sentence will be truncated for COMET-QE!")
+                print(f"    {mt_length} tokens -> {self.max_length} tokens (LOST {mt_length - self.max_length} tokens)")
+                print(f"    Quality score may be inaccurate due to missing context.")
+
         # Prepare data for COMET (expects list of dicts)
-        data = [{
-            "src": source_cleaned,
-            "mt": translation_cleaned
-        }]
-        
+        data = [{"src": src_sent, "mt": mt_sent} for src_sent, mt_sent in pairs]
+
         # Get predictions (returns scores in 0-1 range)
         # Use GPU if available, otherwise CPU
         gpus = 1 if torch.cuda.is_available() else 0
-        
+
         try:
-            scores = self.model.predict(data, batch_size=8, gpus=gpus)
-            # Convert to 0-100 scale
-            return scores.scores[0] * 100
+            with torch.inference_mode():
+                if self._autocast_dtype is not None:
+                    with torch.autocast(device_type="cuda", dtype=self._autocast_dtype):
+                        scores = self.model.predict(data, batch_size=32, gpus=gpus)
+                else:
+                    scores = self.model.predict(data, batch_size=32, gpus=gpus)
+            # Average per-sentence scores and convert to 0-100 scale
+            return sum(scores.scores) / len(scores.scores) * 100
         except Exception as e:
             print(f"Warning: Quality estimation failed: {e}")
             return 0.0
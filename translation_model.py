@@ -1,7 +1,20 @@
-import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
 import torch
 from transformers import AutoModelForSeq2SeqLM, AutoTokenizer
 
+# try optional import - CTranslate2 ships fused int8/fp16 beam-search
+# kernels for NLLB and typically runs generate 2-4x faster than HF
+try:
+    import ctranslate2
+except Exception:
+    ctranslate2 = None
+
+# Route residual FP32 matmuls through TF32 tensor cores on Ampere+ GPUs
+torch.set_float32_matmul_precision('high')
+
+
 class TranslationModel:
     """NLLB-200 1.3B translation optimized for quality."""
 
@@ -19,20 +32,210 @@ class TranslationModel:
         'korean': 'kor_Hang', 'ko': 'kor_Hang',
     }
 
-    def __init__(self, model_name: str = "facebook/nllb-200-distilled-1.3B", progress_callback=None):
+    # Beam widths per quality preset. Per-step compute and KV-cache size
+    # both scale linearly in beams, so 'fast' (greedy) is ~10x cheaper than
+    # 'best' while 'balanced' stays within ~1 BLEU of it for most content.
+    QUALITY_BEAMS = {'fast': 1, 'balanced': 4, 'best': 12}
+
+    # Loaded weights cached at class scope so constructing additional
+    # TranslationModel instances (per-request handlers, hot reloads) reuses
+    # the resident tokenizer/model instead of re-reading GBs from disk and
+    # re-uploading to the GPU. Keyed by (model_name, backend, quantization);
+    # the lock prevents two threads from loading the same weights twice.
+    _MODEL_CACHE: dict[tuple, tuple] = {}
+    _MODEL_CACHE_LOCK = threading.Lock()
+
+    def __init__(self, model_name: str = "facebook/nllb-200-distilled-1.3B", progress_callback=None,
+                 backend: str = "auto", quantization: str = "none"):
         self.model_name = model_name
         self.device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
-        print(f"Loading NLLB-200 model '{model_name}'... (using {self.device})")
-        self.tokenizer = AutoTokenizer.from_pretrained(model_name)
-        self.model = AutoModelForSeq2SeqLM.from_pretrained(model_name).to(self.device)
-        self.model.eval()
-        print("Model loaded.")
-        
+        self.dtype = self._pick_dtype()
+
+        # Memoized token-count probe: chunking measures the same words and
+        # repeated boilerplate many times, and the offset chunker seeds
+        # this cache with per-chunk counts it derives from its single
+        # full-document pass. add_special_tokens=False makes the count
+        # independent of the currently-set src_lang, so entries stay valid
+        # across language pairs.
+        self._token_count_cache: dict[str, int] = {}
+
+        # Language-token ids are stable per model; cache them instead of
+        # hitting the tokenizer's added-tokens map on every batch
+        self._lang_id_cache: dict[str, int] = {}
+
+        cache_key = (model_name, backend, quantization)
+        with self._MODEL_CACHE_LOCK:
+            cached = self._MODEL_CACHE.get(cache_key)
+            if cached is not None:
+                self.tokenizer, self.model, self.translator = cached
+                self._eos_id = self.tokenizer.eos_token_id
+            else:
+                self._load_weights(backend, quantization)
+                self._MODEL_CACHE[cache_key] = (self.tokenizer, self.model, self.translator)
+
         if progress_callback:
             self.progress = progress_callback()
         else:
             self.progress = {"current_batch": 0, "total_batches": 0, "current_text": ""}
 
+    def _load_weights(self, backend: str, quantization: str):
+        """Load tokenizer plus a CTranslate2 translator or transformers model."""
+        print(f"Loading NLLB-200 model '{self.model_name}'... (using {self.device}, {self.dtype})")
+        self.tokenizer = AutoTokenizer.from_pretrained(self.model_name)
+        self._eos_id = self.tokenizer.eos_token_id
+
+        # Prefer the CTranslate2 backend when installed ("auto"); "hf"
+        # forces the eager transformers path
+        self.model = None
+        self.translator = None
+        if backend != "hf" and ctranslate2 is not None:
+            self.translator = self._load_ct2_translator()
+        if self.translator is None:
+            quant_config = self._quant_config(quantization)
+            kwargs = {"low_cpu_mem_usage": True, "attn_implementation": self._attn_implementation()}
+            if quant_config is not None:
+                kwargs["quantization_config"] = quant_config
+            else:
+                kwargs["torch_dtype"] = self.dtype
+            try:
+                self.model = AutoModelForSeq2SeqLM.from_pretrained(self.model_name, **kwargs)
+            except TypeError:
+                # Older transformers without attn_implementation support
+                kwargs.pop("attn_implementation")
+                self.model = AutoModelForSeq2SeqLM.from_pretrained(self.model_name, **kwargs)
+            if quant_config is not None:
+                # bitsandbytes handles device placement itself - no .to()
+                print(f"✓ Weights quantized ({quantization}, bitsandbytes)")
+            else:
+                self.model = self.model.to(self.device)
+            self.model.eval()
+            self._compile_model()
+        print("Model loaded.")
+
+    def _pick_dtype(self) -> torch.dtype:
+        """Half precision on GPU (bf16 on Ampere+), FP32 on CPU.
+
+        Halves HBM traffic and doubles tensor-core throughput for the
+        beam-search generate() that dominates runtime.
+        """
+        if self.device.type != 'cuda':
+            return torch.float32
+        major, _ = torch.cuda.get_device_capability(self.device)
+        return torch.bfloat16 if major >= 8 else torch.float16
+
+    def _attn_implementation(self) -> str:
+        """Pick the fastest available fused-attention kernel.
+
+        flash_attention_2 on Ampere+ GPUs when flash_attn is installed,
+        otherwise PyTorch's built-in SDPA kernels.
+        """
+        if self.device.type == 'cuda':
+            major, _ = torch.cuda.get_device_capability(self.device)
+            if major >= 8:
+                try:
+                    import flash_attn  # noqa: F401 - availability check
+                    return 'flash_attention_2'
+                except Exception:
+                    pass
+        return 'sdpa'
+
+    def _compile_model(self):
+        """Compile the model for fused kernels and lower per-op dispatch.
+
+        dynamic=True because chunk lengths vary between batches; combined
+        with pad-to-multiple-of-8 this keeps recompiles bounded. A dummy
+        translation warms the compiled graph so the first request doesn't
+        pay compilation latency; since Dynamo defers the real compilation
+        to that first forward, the compiled wrapper is only kept once the
+        warm-up succeeds, and the eager model is restored on any failure.
+        """
+        eager = self.model
+        try:
+            self.model = torch.compile(eager, mode='reduce-overhead', fullgraph=False, dynamic=True)
+            self._translate_batch(["Hello."], 'eng_Latn', 'por_Latn', num_beams=2)
+            print("✓ Model compiled with torch.compile")
+        except Exception as compile_error:
+            self.model = eager
+            print(f"Note: torch.compile unavailable, using eager mode ({compile_error})")
+
+    def _quant_config(self, quantization: str):
+        """Build a BitsAndBytesConfig for 'int8'/'int4', or None.
+
+        Weight-only quantization halves (or quarters) the memory bandwidth
+        into the decoder's large linear layers - the bottleneck of
+        memory-bound beam search - at negligible BLEU cost.
+        """
+        if quantization == "none" or self.device.type != "cuda":
+            return None
+        try:
+            import bitsandbytes  # noqa: F401 - availability check
+            from transformers import BitsAndBytesConfig
+        except Exception:
+            print("Note: bitsandbytes unavailable, loading unquantized weights")
+            return None
+        if quantization == "int8":
+            return BitsAndBytesConfig(load_in_8bit=True)
+        if quantization == "int4":
+            return BitsAndBytesConfig(load_in_4bit=True, bnb_4bit_compute_dtype=torch.float16)
+        raise ValueError(f"Unsupported quantization: {quantization}")
+
+    def _load_ct2_translator(self):
+        """Convert (once, cached on disk) and load the CTranslate2 model."""
+        try:
+            ct2_dir = Path.home() / ".cache" / "poc_at_translation" / "ct2" / self.model_name.replace("/", "--")
+            quantization = "int8_float16" if self.device.type == "cuda" else "int8"
+            if not (ct2_dir / "model.bin").exists():
+                from ctranslate2.converters import TransformersConverter
+                print(f"Converting '{self.model_name}' to CTranslate2 ({quantization})...")
+                ct2_dir.parent.mkdir(parents=True, exist_ok=True)
+                TransformersConverter(self.model_name).convert(str(ct2_dir), quantization=quantization)
+            translator = ctranslate2.Translator(
+                str(ct2_dir), device=self.device.type, compute_type=quantization
+            )
+            print("✓ Using CTranslate2 backend")
+            return translator
+        except Exception as ct2_error:
+            print(f"Note: CTranslate2 backend unavailable, using transformers ({ct2_error})")
+            return None
+
+    def _ct2_translate_batch(self, texts: list[str], src: str, tgt: str, max_output_len: int, num_beams: int) -> list[str]:
+        """Translate a batch through CTranslate2's fused beam-search kernels."""
+        self.tokenizer.src_lang = src
+        batch_tokens = [
+            self.tokenizer.convert_ids_to_tokens(self.tokenizer(t).input_ids)
+            for t in texts
+        ]
+        results = self.translator.translate_batch(
+            batch_tokens,
+            beam_size=num_beams,
+            target_prefix=[[tgt]] * len(texts),
+            max_decoding_length=max_output_len,
+            no_repeat_ngram_size=3,
+            repetition_penalty=1.2,
+        )
+        outputs = []
+        for result in results:
+            # Drop the forced target-language prefix token
+            tokens = result.hypotheses[0][1:]
+            ids = self.tokenizer.convert_tokens_to_ids(tokens)
+            outputs.append(self.tokenizer.decode(ids, skip_special_tokens=True))
+        return outputs
+
+    def _token_count(self, s: str) -> int:
+        """Token count of a string (no special tokens), cached."""
+        cache = self._token_count_cache
+        count = cache.get(s)
+        if count is None:
+            if len(cache) >= 100_000:
+                cache.clear()
+            count = len(self.tokenizer(s, add_special_tokens=False).input_ids)
+            cache[s] = count
+        return count
+
+    def _tgt_id(self, tgt: str) -> int:
+        """Token id of a target-language code, cached per language."""
+        return self._lang_id_cache.setdefault(tgt, self.tokenizer.convert_tokens_to_ids(tgt))
+
     @staticmethod
     def _normalize_language_code(lang: str) -> str:
         key = (lang or "").lower().strip()
@@ -48,42 +251,93 @@ class TranslationModel:
         """
         if not text:
             return []
-        
+
         # Set source language for tokenizer
         self.tokenizer.src_lang = src
-        
+
+        # Special tokens (language code + EOS) are added per chunk, not per word
+        overhead = self.tokenizer.num_special_tokens_to_add()
+        budget = max_tokens - overhead
+
+        if self.tokenizer.is_fast:
+            return self._chunk_by_offsets(text, budget)
+        return self._chunk_by_words(text, budget)
+
+    def _chunk_by_offsets(self, text: str, budget: int) -> list[str]:
+        """Chunk by walking the token ids of a single full-text tokenization.
+
+        One Rust tokenizer call yields ids and character offsets for the
+        whole document; chunk boundaries are then found by scanning backward
+        from each budget-sized window to the nearest whitespace-aligned
+        token and slicing the original string - no further tokenization.
+        """
+        enc = self.tokenizer(text, add_special_tokens=False, return_offsets_mapping=True)
+        ids = enc['input_ids']
+        offsets = enc['offset_mapping']
+        n = len(ids)
+
         # Quick check: if entire text fits, return as-is
-        test_tokens = self.tokenizer(text, return_tensors="pt", truncation=False, add_special_tokens=True)
-        if test_tokens['input_ids'].shape[1] <= max_tokens:
+        if n <= budget:
             return [text]
-        
-        # Split by whitespace to get words
+
+        chunks = []
+        start_tok = 0
+        while start_tok < n:
+            end_tok = min(start_tok + budget, n)
+            if end_tok < n:
+                # Scan backward for a token starting at a word boundary to
+                # avoid mid-word cuts
+                cut = end_tok
+                while cut > start_tok:
+                    char_start = offsets[cut][0]
+                    if char_start == 0 or text[char_start - 1].isspace() or text[char_start].isspace():
+                        break
+                    cut -= 1
+                if cut > start_tok:
+                    end_tok = cut
+                # else: one word exceeds the budget; hard cut mid-word
+            start_char = offsets[start_tok][0]
+            end_char = offsets[end_tok - 1][1]
+            chunk = text[start_char:end_char].strip()
+            if chunk:
+                chunks.append(chunk)
+                # Seed the probe cache from this pass so later length
+                # lookups (batching, bucketing) need no retokenization
+                self._token_count_cache.setdefault(chunk, end_tok - start_tok)
+            start_tok = end_tok
+
+        return chunks if chunks else [text]
+
+    def _chunk_by_words(self, text: str, budget: int) -> list[str]:
+        """Fallback chunker for slow tokenizers without offset mappings."""
+        # Quick check: if entire text fits, return as-is
+        if self._token_count(text) <= budget:
+            return [text]
+
+        # Split by whitespace and keep a running token total per chunk:
+        # the old loop retokenized the whole growing chunk for every
+        # appended word - O(N^2) tokenizer calls over the document
         words = text.split()
         chunks = []
         current_chunk = []
-        current_text = ""
-        
+        current_tokens = 0
+
         for word in words:
-            # Try adding this word to current chunk
-            test_text = current_text + (" " if current_text else "") + word
-            test_tokens = self.tokenizer(test_text, return_tensors="pt", truncation=False, add_special_tokens=True)
-            token_count = test_tokens['input_ids'].shape[1]
-            
-            if token_count <= max_tokens:
-                # Word fits, add it
-                current_chunk.append(word)
-                current_text = test_text
-            else:
+            word_tokens = self._token_count(word)
+
+            if current_chunk and current_tokens + word_tokens > budget:
                 # Word doesn't fit, save current chunk and start new one
-                if current_chunk:
-                    chunks.append(" ".join(current_chunk))
-                current_chunk = [word]
-                current_text = word
-        
+                chunks.append(" ".join(current_chunk))
+                current_chunk = []
+                current_tokens = 0
+
+            current_chunk.append(word)
+            current_tokens += word_tokens
+
         # Don't forget last chunk
         if current_chunk:
             chunks.append(" ".join(current_chunk))
-        
+
         return chunks if chunks else [text]
 
 
@@ -98,33 +352,59 @@ class TranslationModel:
         """
         if not texts:
             return []
-        
+
+        if self.translator is not None:
+            return self._ct2_translate_batch(texts, src, tgt, max_output_len, num_beams)
+
+        inputs = self._tokenize_batch(texts, src, max_input_len)
+        return self._generate_batch(inputs, tgt, max_output_len, num_beams)
+
+    def _tokenize_batch(self, texts: list[str], src: str, max_input_len: int = 512) -> dict:
+        """Tokenize a batch into padded CPU tensors (pinned when on GPU)."""
         self.tokenizer.src_lang = src
-        
-        # Detect actual input truncation by comparing with/without truncation
-        for i, text in enumerate(texts):
-            tokens_no_trunc = self.tokenizer(text, return_tensors="pt", truncation=False, add_special_tokens=True)
-            tokens_with_trunc = self.tokenizer(text, return_tensors="pt", truncation=True, max_length=max_input_len, add_special_tokens=True)
-            
-            actual_length = tokens_no_trunc['input_ids'].shape[1]
-            truncated_length = tokens_with_trunc['input_ids'].shape[1]
-            
-            if actual_length != truncated_length:
-                print(f"⚠️  TRUNCATION DETECTED: Input was truncated! Chunk {i+1}: {actual_length} tokens -> {truncated_length} tokens (LOST {actual_length - truncated_length} tokens)")
-        
+
+        # Pad to the longest sequence in the batch, rounded up to a multiple
+        # of 8 on GPU so every attention/FFN matmul hits tensor-core tile
+        # alignment (padding to a flat 512 wasted compute on short batches)
         inputs = self.tokenizer(
             texts,
             return_tensors="pt",
-            padding='max_length',
+            padding='longest',
+            pad_to_multiple_of=8 if self.device.type == 'cuda' else None,
             truncation=False,
             max_length=max_input_len
-        ).to(self.device)
+        )
+
+        # Truncation diagnostic from the batched tokenization itself - the
+        # old per-chunk probe retokenized every input a second time just to
+        # log this warning
+        batch_len = inputs['input_ids'].shape[1]
+        if batch_len > max_input_len:
+            print(f"⚠️  TRUNCATION RISK: Batch is {batch_len} tokens wide, beyond the model's {max_input_len}-token window")
 
-        with torch.no_grad():
+        if self.device.type == 'cuda':
+            # Pinned host memory enables an async H2D copy in _generate_batch
+            inputs = {k: v.pin_memory() for k, v in inputs.items()}
+        return dict(inputs)
+
+    def _generate_batch(self, inputs: dict, tgt: str, max_output_len: int = 1024, num_beams: int = 12) -> list[str]:
+        """Run generation on pre-tokenized inputs and decode the outputs."""
+        inputs = {k: v.to(self.device, non_blocking=True) for k, v in inputs.items()}
+
+        # Cap generation at a realistic expansion of the input (~1.5x plus
+        # slack) instead of a flat total length: the KV cache stays tight
+        # and the decode loop ends as soon as the translation plausibly can
+        max_new_tokens = min(int(inputs['input_ids'].shape[1] * 1.5) + 16, max_output_len)
+
+        # inference_mode beats no_grad here: it also disables tensor version
+        # counters and view tracking, trimming per-op overhead in the tight
+        # decoder loop, and outputs never re-enter autograd
+        with torch.inference_mode():
             gen = self.model.generate(
                 **inputs,
-                forced_bos_token_id=self.tokenizer.convert_tokens_to_ids(tgt),
-                max_length=max_output_len,
+                forced_bos_token_id=self._tgt_id(tgt),
+                max_new_tokens=max_new_tokens,
+                use_cache=True,
                 num_beams=num_beams,
                 length_penalty=1.0,  # Neutral - don't force longer or shorter
                 no_repeat_ngram_size=3,
@@ -132,42 +412,45 @@ class TranslationModel:
                 repetition_penalty=1.2,  # Discourage repetitive output
             )
         
-        # Detect actual output truncation: check if EOS token is missing at the end
-        # Note: max_length in generate() is input+output combined length
-        eos_token_id = self.tokenizer.eos_token_id
-        for i, output_ids in enumerate(gen):
-            # For 1D tensor (single sequence)
-            if output_ids.dim() == 1:
-                output_length = output_ids.shape[0]
-                last_token = output_ids[-1].item()
-            else:  # Should not happen but handle it
-                output_length = output_ids.shape[-1]
-                last_token = output_ids[0, -1].item() if output_ids.shape[0] > 0 else None
-            
-            # If last token is NOT EOS, generation was cut off (incomplete translation)
-            if last_token is not None and last_token != eos_token_id:
-                print(f"⚠️  TRUNCATION DETECTED: Output was truncated! Chunk {i+1}: Generation stopped without EOS token (translation incomplete, {output_length} tokens generated)")
+        # Detect actual output truncation: a sequence that never produced
+        # EOS was cut off by max_new_tokens. One vectorized kernel and a
+        # single device sync, instead of a Python loop calling .item() (a
+        # sync per sequence); containment also stays correct for shorter
+        # sequences that end in EOS followed by padding.
+        missing_eos = (~(gen == self._eos_id).any(dim=1)).nonzero(as_tuple=True)[0].tolist()
+        for i in missing_eos:
+            print(f"⚠️  TRUNCATION DETECTED: Output was truncated! Chunk {i+1}: Generation stopped without EOS token (translation incomplete, {gen.shape[1]} tokens generated)")
 
         return self.tokenizer.batch_decode(gen, skip_special_tokens=True)
 
-    def translate(self, text: str, source_lang: str, target_lang: str, chunk_size: int = 512, num_beams: int = 12) -> str:
+    def translate(self, text: str, source_lang: str, target_lang: str, chunk_size: int = 512, num_beams: int = None, batch_size: int = 8, quality: str = 'best') -> str:
         """Translate text using NLLB-200 with optimized chunking strategy.
-        
+
         Priority: Translation quality over output formatting.
-        
+
         Args:
             text: Text to translate
             source_lang: Source language code
             target_lang: Target language code
             chunk_size: Max tokens per chunk (reduced from 512 to provide more context overlap)
-            num_beams: Beam search width (12 recommended for quality, 8 for speed, 16 for max quality)
-        
+            num_beams: Explicit beam width; overrides the quality preset
+            batch_size: Chunks per generate() call - beam search on a GPU
+                absorbs several sequences per step, amortizing kernel-launch
+                and KV-cache bandwidth across the batch
+            quality: 'fast' (greedy), 'balanced' (4 beams) or 'best'
+                (12 beams)
+
         Returns:
             Translated text
         """
         if not text:
             return text
 
+        if num_beams is None:
+            if quality not in self.QUALITY_BEAMS:
+                raise ValueError(f"Unsupported quality preset: {quality}")
+            num_beams = self.QUALITY_BEAMS[quality]
+
         src = self._normalize_language_code(source_lang)
         tgt = self._normalize_language_code(target_lang)
         if src == tgt:
@@ -177,30 +460,85 @@ class TranslationModel:
 
         # Split text into smaller chunks (512 tokens)
         chunks = self._chunk_by_tokens(text, src, max_tokens=chunk_size)
-        
+
         self.progress["total_batches"] = len(chunks)
         self.progress["current_batch"] = 0
-        print(f"Translating {len(chunks)} chunks ({chunk_size} tokens max per chunk, {num_beams} beams)...")
-
-        results = []
-
-        for idx, chunk in enumerate(chunks):
-            self.progress["current_text"] = chunk[:80] + ("..." if len(chunk) > 80 else "")
-
-            # Translate with increased beam search and higher output limit
-            # max_output_len=1536 allows for expansion (translations can be longer than source)
-            translated = self._translate_batch(
-                [chunk], 
-                src, 
-                tgt, 
-                max_input_len=chunk_size,
-                max_output_len=1024,
-                num_beams=num_beams
-            )[0]
-            results.append(translated)
-            
-            self.progress["current_batch"] += 1
-            print(f"Chunk {self.progress['current_batch']}/{self.progress['total_batches']} done")
+        print(f"Translating {len(chunks)} chunks ({chunk_size} tokens max per chunk, {num_beams} beams, batches of {batch_size})...")
+
+        # Dedupe before batching: PDFs repeat headers, footers and
+        # boilerplate verbatim, and beam search over an identical chunk
+        # produces an identical translation. Only the first occurrence is
+        # generated; the rest are filled in by copy after the loop.
+        first_index: dict[str, int] = {}
+        unique_indices: list[int] = []
+        duplicates: list[tuple[int, int]] = []
+        for j, chunk in enumerate(chunks):
+            rep = first_index.setdefault(chunk, j)
+            if rep == j:
+                unique_indices.append(j)
+            else:
+                duplicates.append((j, rep))
+        if duplicates:
+            print(f"Skipping {len(duplicates)} duplicate chunks ({len(unique_indices)} unique)")
+
+        # Length-bucket: batching chunks of similar token length minimizes
+        # padding, so attention FLOPs and KV-cache memory aren't spent on
+        # pad positions. Results are scattered back into document order.
+        # Token counts come from the chunking pass via the probe cache.
+        order = sorted(unique_indices, key=lambda j: self._token_count(chunks[j]))
+        index_batches = [order[i:i + batch_size] for i in range(0, len(order), batch_size)]
+        results: list[str] = [""] * len(chunks)
+
+        if self.model is not None and len(index_batches) > 1:
+            # Prefetch pipeline: a single producer thread tokenizes batch
+            # N+1 while the GPU generates batch N, hiding CPU tokenization
+            # and (with pinned memory) the H2D copy behind compute
+            with ThreadPoolExecutor(max_workers=1) as ex:
+                futures = [
+                    ex.submit(self._tokenize_batch, [chunks[j] for j in b], src, chunk_size)
+                    for b in index_batches[:2]
+                ]
+                for i, index_batch in enumerate(index_batches):
+                    first = chunks[index_batch[0]]
+                    self.progress["current_text"] = first[:80] + ("..." if len(first) > 80 else "")
+
+                    inputs = futures[i].result()
+                    if i + 2 < len(index_batches):
+                        futures.append(ex.submit(
+                            self._tokenize_batch,
+                            [chunks[j] for j in index_batches[i + 2]], src, chunk_size
+                        ))
+
+                    translated = self._generate_batch(inputs, tgt, max_output_len=1024, num_beams=num_beams)
+                    for j, translation in zip(index_batch, translated):
+                        results[j] = translation
+
+                    self.progress["current_batch"] += len(index_batch)
+                    print(f"Chunk {self.progress['current_batch']}/{self.progress['total_batches']} done")
+        else:
+            for index_batch in index_batches:
+                first = chunks[index_batch[0]]
+                self.progress["current_text"] = first[:80] + ("..." if len(first) > 80 else "")
+
+                # Translate with increased beam search and higher output limit
+                # max_output_len=1024 allows for expansion (translations can be longer than source)
+                translated = self._translate_batch(
+                    [chunks[j] for j in index_batch],
+                    src,
+                    tgt,
+                    max_input_len=chunk_size,
+                    max_output_len=1024,
+                    num_beams=num_beams
+                )
+                for j, translation in zip(index_batch, translated):
+                    results[j] = translation
+
+                self.progress["current_batch"] += len(index_batch)
+                print(f"Chunk {self.progress['current_batch']}/{self.progress['total_batches']} done")
+
+        for j, rep in duplicates:
+            results[j] = results[rep]
+        self.progress["current_batch"] += len(duplicates)
 
         # Join with space to maintain readability
         return " ".join(results)